@@ -6,14 +6,14 @@ Generates all possible combinations of unique upward and/or downward paths for t
 classes and exports them as batched TSV files into class-specific directories. This
 script supports DFS-based path generation, filtering of paths by an allowed node
 threshold, and optional removal of the last downward path. It also logs detailed
-statistics for each class while managing memory via explicit garbage collection.
+statistics for each class.
 
 Usage:
     python get_paths.py [--num_classes NUM_CLASSES]
         [--max_depth MAX_DEPTH] [--max_paths_per_class MAX_PATHS_PER_CLASS]
         [--allowed_threshold ALLOWED_THRESHOLD]
         [--batch_size BATCH_SIZE] --direction {upward,downward,both}
-        [--output_dir OUTPUT_DIR]
+        [--output_dir OUTPUT_DIR] [--dedup]
 
 Example:
     python get_paths.py --num_classes 20 --max_depth 5 \
@@ -27,97 +27,81 @@ import json
 import random
 import time
 import argparse
-from itertools import islice
+from itertools import islice, chain
 from tqdm.auto import tqdm
-from collections import defaultdict
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Iterator, Optional
 import psutil
 import gc
-import csv
 import sys
+import logging
+import mmap
+import gzip
+from array import array
+import numpy as np
 
-# Set a random seed for reproducibility (optional)
-# random.seed(42)
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module is used without it
+    orjson = None
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the pure-Python DFS is used without it
+    njit = None
 
-class TrieNode:
-    """
-    Represents a node in a Trie (prefix tree) data structure.
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; it is only needed for zstd output
+    zstandard = None
 
-    Attributes:
-        children (dict[str, TrieNode]): A dictionary mapping entities to their child
-        TrieNodes. is_end_of_path (bool): Indicates whether the current node marks the
-        end of a valid path.
-    """
+logger = logging.getLogger(__name__)
 
-    def __init__(self) -> None:
-        self.children: dict[str, "TrieNode"] = {}
-        self.is_end_of_path: bool = False
+# Set a random seed for reproducibility (optional)
+# random.seed(42)
 
+# File name suffix appended to ".tsv" for each --compression choice
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
 
-class PathTrie:
-    """
-    Trie (prefix tree) data structure for efficiently storing and retrieving unique
-    paths.
 
-    Attributes:
-        root (TrieNode): The root node of the Trie.
+def load_json(path: str):
     """
+    Loads a JSON file. With orjson installed, the file is memory-mapped and parsed
+    in place, which is several times faster than json.load on the multi-GB
+    child_to_parents.json and avoids reading it into an intermediate buffer.
 
-    def __init__(self) -> None:
-        self.root = TrieNode()
-
-    def insert(self, path: list[str]) -> None:
-        """
-        Inserts a path into the Trie.
-
-        Args:
-            path (list[str]): A list of entities representing the path to be inserted.
-        """
-        node = self.root
-        for entity in path:
-            if entity not in node.children:
-                node.children[entity] = TrieNode()
-            node = node.children[entity]
-        node.is_end_of_path = True
-
-    def traverse(
-        self,
-        node: Optional[TrieNode] = None,
-        path: Optional[list[str]] = None,
-        all_paths: Optional[list[list[str]]] = None,
-    ) -> list[list[str]]:
-        """
-        Traverses the Trie and retrieves all unique complete paths.
+    Args:
+        path (str): Path to the JSON file.
 
-        Args:
-            node (Optional[TrieNode]): The current node in the Trie during traversal.
-                Defaults to root.
-            path (Optional[list[str]]): The current path being traversed. Defaults to an
-                empty list.
-            all_paths (Optional[list[list[str]]]): The list accumulating all unique
-                paths. Defaults to an empty list.
+    Returns:
+        The parsed JSON data.
+    """
+    if orjson is None or os.path.getsize(path) == 0:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
 
-        Returns:
-            list[list[str]]: A list of all unique complete paths stored in the Trie.
-        """
-        if node is None:
-            node = self.root
-        if path is None:
-            path = []
-        if all_paths is None:
-            all_paths = []
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            with memoryview(buf) as view:
+                return orjson.loads(view)
 
-        # A complete path is one that ends here and has no further children
-        if node.is_end_of_path and not node.children:
-            all_paths.append(path.copy())
 
-        for entity, child_node in node.children.items():
-            path.append(entity)
-            self.traverse(child_node, path, all_paths)
-            path.pop()
+@contextmanager
+def gc_paused():
+    """
+    Disables the cyclic garbage collector for the duration of the block.
 
-        return all_paths
+    Unpacking paths allocates millions of tuples but no reference cycles, so
+    collections triggered by those allocations would only rescan live objects.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
 
 
 def get_memory_usage() -> float:
@@ -132,89 +116,328 @@ def get_memory_usage() -> float:
     return mem_info.rss / (1024**2)  # Convert bytes to MB
 
 
+def _dfs_paths_kernel(
+    start: int,
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    min_depth: int,
+    max_depth: int,
+    max_paths: int,
+    randomize: bool,
+    seed: int,
+    allowed_mask: np.ndarray,
+    allowed_threshold: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compiled counterpart of the DFS in `generate_paths_dfs`, JIT-compiled with numba
+    when it is installed. Limits that are not set are passed as 0 (`max_depth`,
+    `max_paths`) or a negative number (`allowed_threshold`). Exit frames are stored
+    on the stack as `-node - 1`. When randomizing, numba's own random state is seeded
+    with `seed`, which the caller draws from the `random` module.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: All paths concatenated into one int32 array,
+            and the offsets of each path in it (path i is flat[offsets[i]:
+            offsets[i + 1]]).
+    """
+    if randomize:
+        np.random.seed(seed)
+    visited = np.zeros(indptr.shape[0] - 1, dtype=np.bool_)
+    stack = [start]
+    path = [start]
+    path.pop()
+    flat = [start]
+    flat.pop()
+    offsets = [0]
+    paths_generated = 0
+
+    while len(stack) > 0:
+        if max_paths > 0 and paths_generated >= max_paths:
+            break
+
+        current = stack.pop()
+
+        if current < 0:
+            visited[path.pop()] = False
+            continue
+
+        depth = len(path)
+        if max_depth > 0 and depth > max_depth:
+            continue
+
+        begin = indptr[current]
+        end = indptr[current + 1]
+        if begin == end:
+            if depth >= min_depth:
+                if allowed_threshold >= 0:
+                    allowed_count = 1 if allowed_mask[current] else 0
+                    for n in path:
+                        if allowed_mask[n]:
+                            allowed_count += 1
+                    if allowed_count / (depth + 1) < allowed_threshold:
+                        continue
+                for n in path:
+                    flat.append(n)
+                flat.append(current)
+                offsets.append(len(flat))
+                paths_generated += 1
+            continue
+
+        path.append(current)
+        visited[current] = True
+        stack.append(-current - 1)
+
+        degree = end - begin
+        offset = np.random.randint(0, degree) if randomize else 0
+        for k in range(degree):
+            adjacent = indices[begin + (offset + k) % degree]
+            if not visited[adjacent]:
+                stack.append(np.int64(adjacent))
+
+    return np.array(flat, dtype=np.int32), np.array(offsets, dtype=np.int64)
+
+
+if njit is not None:
+    _dfs_paths_kernel = njit(cache=True)(_dfs_paths_kernel)
+
+
 def generate_paths_dfs(
-    node: str,
-    mapping: dict[str, list[str]],
+    node: int,
+    graph: tuple[np.ndarray, np.ndarray],
     min_depth: int,
     max_depth: Optional[int] = None,
     max_paths: Optional[int] = None,
-    allowed_nodes: Optional[set[str]] = None,
+    allowed_mask: Optional[np.ndarray] = None,
     allowed_threshold: Optional[float] = None,
-) -> list[list[str]]:
+) -> tuple[np.ndarray, np.ndarray]:
     """
     Generates all complete paths from the given node using Depth-First Search (DFS),
-    stopping early if the maximum number of paths is reached.
+    stopping early if the maximum number of paths is reached. Uses the numba-compiled
+    `_dfs_paths_kernel` when numba is available.
+
+    The paths are returned packed into one flat int32 array rather than as one Python
+    object per path, which takes several times less memory.
+
+    When `max_paths` is set, the paths are sampled: the adjacent nodes of each node
+    are visited in their stored order, rotated to start at a random one.
 
     Args:
-        node (str): The starting node for path generation.
-        mapping (dict[str, list[str]]): A mapping from each node to its adjacent nodes
-            (either parents or children).
+        node (int): The id of the starting node for path generation.
+        graph (tuple[np.ndarray, np.ndarray]): CSR adjacency (indptr, indices) of each
+            node id (either parents or children), see `mapping_to_csr`.
         min_depth (int): The minimum allowed depth for path generation.
         max_depth (Optional[int]): The maximum allowed depth for path generation.
             If None, no upper bound.
         max_paths (Optional[int]): The maximum number of paths to generate. If None, no
             limit.
-        allowed_nodes (Optional[set[str]]): The set of allowed nodes (e.g., top
-            classes).
+        allowed_mask (Optional[np.ndarray]): Boolean mask of the allowed node ids
+            (e.g., top classes).
         allowed_threshold (Optional[float]): The minimum fraction of allowed nodes that
             must be in a path.
 
-    Yields:
-        list[str]: A list of entities representing a complete path from the starting
-            node.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: All paths concatenated into one int32 array,
+            and the offsets of each path in it (path i is flat[offsets[i]:
+            offsets[i + 1]]).
     """
-    stack: list[tuple[str, list[str]]] = [(node, [node])]
+    indptr, indices = graph
+    check_allowed = allowed_mask is not None and allowed_threshold is not None
+
+    if njit is not None:
+        return _dfs_paths_kernel(
+            node,
+            indptr,
+            indices,
+            min_depth,
+            max_depth or 0,
+            max_paths or 0,
+            max_paths is not None,
+            # Drawn from `random`, so that seeding it also makes the compiled DFS
+            # reproducible
+            random.getrandbits(32) if max_paths is not None else 0,
+            allowed_mask if check_allowed else np.zeros(0, dtype=np.bool_),
+            allowed_threshold if check_allowed else -1.0,
+        )
+
+    # A single path and visited set are shared by the whole search. Entering a node
+    # pushes an exit frame, stored as -node - 1, below its children; popping that
+    # frame backtracks. The stack and path are int arrays, with no object per frame.
+    stack = array("i", [node])
+    path = array("i")
+    visited: set[int] = set()
+    flat = array("i")
+    offsets = array("q", [0])
     paths_generated = 0  # Counter to track the number of generated paths
 
+    # Resolve the optional limits once, so the loop runs the same comparisons
+    # whether or not they are set. A path never holds more nodes than the graph,
+    # and -1 paths are never reached.
+    depth_limit = max_depth or len(indptr)
+    paths_limit = max_paths or -1
+    min_length = min_depth + 1
+    randomize = max_paths is not None
+
     while stack:
-        if max_paths and paths_generated >= max_paths:
-            break  # Stop if we've reached the maximum number of paths
+        current = stack.pop()
 
-        current, path = stack.pop()
+        if current < 0:
+            visited.discard(path.pop())
+            continue
 
-        # Skip if path exceeds max_depth
-        if max_depth and (len(path) - 1) > max_depth:
+        # Skip if path exceeds max_depth (the depth of current is len(path))
+        if len(path) > depth_limit:
             continue
 
-        if current not in mapping or not mapping[current]:
-            if (len(path) - 1) >= min_depth:
+        begin, end = indptr[current], indptr[current + 1]
+        if begin == end:
+            path.append(current)
+            if len(path) >= min_length:
                 # If threshold checking is requested, check the fraction here.
-                if allowed_nodes is not None and allowed_threshold is not None:
-                    allowed_count = sum(1 for n in path if n in allowed_nodes)
-                    if (allowed_count / len(path)) < allowed_threshold:
-                        continue  # Skip yielding this path.
-                yield path
-                paths_generated += 1
+                if (
+                    not check_allowed
+                    or np.count_nonzero(allowed_mask[path]) / len(path)
+                    >= allowed_threshold
+                ):
+                    flat.extend(path)
+                    offsets.append(len(flat))
+                    paths_generated += 1
+                    if paths_generated == paths_limit:
+                        break  # Stop if we've reached the maximum number of paths
+            path.pop()
             continue
 
-        adjacent_nodes = mapping.get(current, [])
-        if max_paths is not None:
-            random.shuffle(adjacent_nodes)
+        path.append(current)
+        visited.add(current)
+        stack.append(-current - 1)
+
+        # When sampling, start at a random adjacent node instead of shuffling them all
+        adjacent_nodes = indices[begin:end].tolist()
+        if randomize:
+            offset = random.randrange(len(adjacent_nodes))
+            adjacent_nodes = adjacent_nodes[offset:] + adjacent_nodes[:offset]
         for adjacent in adjacent_nodes:
-            if adjacent not in path:  # Prevent cycles
-                stack.append((adjacent, path + [adjacent]))
+            if adjacent not in visited:  # Prevent cycles
+                stack.append(adjacent)
+
+    return np.frombuffer(flat, dtype=np.int32), np.frombuffer(offsets, dtype=np.int64)
 
 
-def invert_mapping(child_to_parents: dict[str, list[str]]) -> dict[str, list[str]]:
+def build_entity_index(
+    child_to_parents: dict[str, list[str]], extra_entities: list[str] = []
+) -> tuple[list[str], dict[str, int]]:
     """
-    Inverts a child_to_parents mapping to create a parent_to_children mapping,
-    ensuring that there are no duplicate children in the lists.
+    Assigns a contiguous integer id to every entity in the child_to_parents mapping,
+    so that paths can be stored as ints instead of repeated QID strings.
 
     Args:
         child_to_parents (dict[str, list[str]]): Mapping from child nodes to parent
             nodes.
+        extra_entities (list[str]): Entities to index even if they do not appear in
+            the mapping (e.g., the classes to process).
 
     Returns:
-        dict[str, list[str]]: Mapping from parent nodes to unique child nodes.
+        tuple[list[str], dict[str, int]]: The id to QID table and its inverse.
     """
-    parent_to_children: defaultdict[str, set[str]] = defaultdict(set)
+    id_to_qid: list[str] = []
+    qid_to_id: dict[str, int] = {}
+
+    for entity in extra_entities:
+        if entity not in qid_to_id:
+            qid_to_id[entity] = len(id_to_qid)
+            id_to_qid.append(entity)
 
     for child, parents in child_to_parents.items():
-        for parent in parents:
-            parent_to_children[parent].add(child)  # Using set to prevent duplicates
+        for entity in (child, *parents):
+            if entity not in qid_to_id:
+                qid_to_id[entity] = len(id_to_qid)
+                id_to_qid.append(entity)
+
+    return id_to_qid, qid_to_id
 
-    # Convert sets back to sorted lists for consistency
-    return {parent: sorted(children) for parent, children in parent_to_children.items()}
+
+def encode_mapping(
+    mapping: dict[str, list[str]], qid_to_id: dict[str, int]
+) -> dict[int, array]:
+    """
+    Converts a QID mapping to an id mapping with compact int32 adjacency arrays.
+    Repeated adjacent nodes (e.g., a superclass stated twice with different
+    qualifiers) are kept once, so the DFS never generates the same path twice.
+
+    Args:
+        mapping (dict[str, list[str]]): Mapping from each node to its adjacent nodes.
+        qid_to_id (dict[str, int]): The QID to id table from `build_entity_index`.
+
+    Returns:
+        dict[int, array]: Mapping from each node id to an array of unique adjacent
+            node ids, in their first order.
+    """
+    return {
+        qid_to_id[node]: array(
+            "i", dict.fromkeys(qid_to_id[adjacent] for adjacent in adjacents)
+        )
+        for node, adjacents in mapping.items()
+    }
+
+
+def mapping_to_csr(
+    mapping: dict[int, array], num_nodes: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Packs an id mapping into compressed sparse row (CSR) arrays: the adjacent nodes of
+    node i are indices[indptr[i]:indptr[i + 1]].
+
+    Args:
+        mapping (dict[int, array]): Mapping from each node id to its adjacent node ids.
+        num_nodes (int): Number of entity ids.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The int64 indptr and int32 indices arrays.
+    """
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    for node, adjacents in mapping.items():
+        indptr[node + 1] = len(adjacents)
+    np.cumsum(indptr, out=indptr)
+
+    indices = np.empty(indptr[-1], dtype=np.int32)
+    for node, adjacents in mapping.items():
+        indices[indptr[node] : indptr[node + 1]] = np.frombuffer(adjacents, np.int32)
+
+    return indptr, indices
+
+
+def invert_mapping(
+    child_to_parents: tuple[np.ndarray, np.ndarray],
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Inverts a child_to_parents CSR graph to create a parent_to_children CSR graph,
+    ensuring that there are no duplicate children in the lists. The edges are sorted
+    and deduplicated with numpy instead of a Python loop per edge.
+
+    Args:
+        child_to_parents (tuple[np.ndarray, np.ndarray]): CSR graph from child nodes
+            to parent nodes.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: CSR graph from parent nodes to unique child
+            nodes, sorted by id.
+    """
+    indptr, indices = child_to_parents
+    num_nodes = len(indptr) - 1
+
+    children = np.repeat(np.arange(num_nodes, dtype=np.int32), np.diff(indptr))
+    parents = indices
+
+    # Sort the edges by parent, then child, and drop repeated (parent, child) pairs
+    order = np.lexsort((children, parents))
+    parents, children = parents[order], children[order]
+    keep = np.ones(len(parents), dtype=np.bool_)
+    keep[1:] = (parents[1:] != parents[:-1]) | (children[1:] != children[:-1])
+    parents, children = parents[keep], children[keep]
+
+    inverted_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(parents, minlength=num_nodes), out=inverted_indptr[1:])
+
+    return inverted_indptr, children
 
 
 def format_time(seconds: float) -> str:
@@ -264,11 +487,516 @@ def unique_list_of_lists(lists: list[list]):
     return unique
 
 
+def remove_prefix_paths(paths: list[tuple[int, ...]]) -> list[tuple[int, ...]]:
+    """
+    Removes the paths that are a proper prefix of another path.
+
+    Sorting puts every path right before the paths it is a prefix of, so one pass over
+    the sorted paths comparing each path with its successor is enough.
+
+    Args:
+        paths (list[tuple[int, ...]]): A list of unique paths.
+
+    Returns:
+        list[tuple[int, ...]]: The paths that are not a prefix of any other path.
+    """
+    sorted_paths = sorted(paths)
+    return [
+        path
+        for path, next_path in zip(sorted_paths, sorted_paths[1:] + [None])
+        if next_path is None or next_path[: len(path)] != path
+    ]
+
+
+def pack_paths(paths: list[tuple[int, ...]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Packs paths into the flat int32 array and offsets returned by
+    `generate_paths_dfs`.
+
+    Args:
+        paths (list[tuple[int, ...]]): The paths to pack.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The concatenated paths and their offsets.
+    """
+    offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+    np.cumsum([len(path) for path in paths], out=offsets[1:])
+    flat = np.fromiter(
+        chain.from_iterable(paths), dtype=np.int32, count=int(offsets[-1])
+    )
+    return flat, offsets
+
+
+def unpack_paths(paths: tuple[np.ndarray, np.ndarray]) -> list[tuple[int, ...]]:
+    """
+    Unpacks paths packed by `generate_paths_dfs` or `pack_paths` into tuples.
+
+    Args:
+        paths (tuple[np.ndarray, np.ndarray]): The concatenated paths and their
+            offsets.
+
+    Returns:
+        list[tuple[int, ...]]: One tuple of entity ids per path.
+    """
+    flat, offsets = paths
+    flat, offsets = flat.tolist(), offsets.tolist()
+    return [tuple(flat[offsets[i] : offsets[i + 1]]) for i in range(len(offsets) - 1)]
+
+
+def shuffled_paths(paths: tuple[np.ndarray, np.ndarray]) -> Iterator[list[int]]:
+    """
+    Shuffles packed paths, and returns an iterator that unpacks them one at a time in
+    the shuffled order.
+
+    Args:
+        paths (tuple[np.ndarray, np.ndarray]): The concatenated paths and their
+            offsets.
+
+    Returns:
+        Iterator[list[int]]: The entity ids of each path, in random order.
+    """
+    flat, offsets = paths
+    order = array("q", range(len(offsets) - 1))
+    random.shuffle(order)
+    return (flat[offsets[i] : offsets[i + 1]].tolist() for i in order)
+
+
+def path_to_tsv_row(path: list[int], qid_bytes: list[bytes]) -> bytes:
+    """
+    Renders a path of entity ids as a TSV row of QIDs.
+
+    Args:
+        path (list[int]): The entity ids of the path.
+        qid_bytes (list[bytes]): Table mapping entity ids to UTF-8 encoded QIDs.
+
+    Returns:
+        bytes: The tab-separated QIDs, terminated by a newline.
+    """
+    return b"\t".join([qid_bytes[i] for i in path]) + b"\n"
+
+
+def write_batch(
+    batch_rows: list[bytes], tsv_filepath: str, compression: str = "none"
+) -> None:
+    """
+    Writes a batch of rendered TSV rows to a file with a single call.
+
+    QIDs never contain tabs, quotes or newlines, so rows are rendered by joining
+    directly instead of going through csv.writer. Rows are already encoded, so the
+    file is opened in binary mode and skips the text encoding layer.
+
+    Args:
+        batch_rows (list[bytes]): Rows from `path_to_tsv_row`, newline included.
+        tsv_filepath (str): Path of the TSV file to write.
+        compression (str): 'none', 'gzip' (level 1) or 'zstd' (level 3). The caller
+            picks the matching file name suffix from `COMPRESSION_SUFFIXES`.
+    """
+    data = b"".join(batch_rows)
+    if compression == "gzip":
+        with gzip.open(tsv_filepath, "wb", compresslevel=1) as tsv_file:
+            tsv_file.write(data)
+    elif compression == "zstd":
+        with open(tsv_filepath, "wb") as tsv_file:
+            tsv_file.write(zstandard.ZstdCompressor(level=3).compress(data))
+    else:
+        with open(tsv_filepath, "wb") as tsv_file:
+            tsv_file.write(data)
+
+
+# Graph and lookup tables shared by every class. _init_worker sets them once per
+# process, so the mappings are not pickled again for every submitted class.
+_worker_state: dict = {}
+
+
+def _init_worker(
+    child_to_parents: tuple[np.ndarray, np.ndarray],
+    parent_to_children: tuple[np.ndarray, np.ndarray],
+    qid_bytes: list[bytes],
+    qid_to_id: dict[str, int],
+    allowed_mask: np.ndarray,
+    log_level: int = logging.INFO,
+) -> None:
+    """
+    Stores the graph and lookup tables used by `_process_class` in this process.
+
+    Args:
+        child_to_parents (tuple[np.ndarray, np.ndarray]): Child to parents CSR graph.
+        parent_to_children (tuple[np.ndarray, np.ndarray]): Parent to children CSR
+            graph.
+        qid_bytes (list[bytes]): Table mapping entity ids to UTF-8 encoded QIDs, so
+            that TSV rows are rendered as bytes. It is built once by
+            `sample_and_combine_paths` and shared by forked workers.
+        qid_to_id (dict[str, int]): Table mapping QIDs to entity ids.
+        allowed_mask (np.ndarray): Boolean mask of the top class ids.
+        log_level (int): Logging level, applied if this process has no logging
+            configuration yet (i.e., it was spawned rather than forked).
+    """
+    logging.basicConfig(level=log_level, format="%(message)s")
+    _worker_state["child_to_parents"] = child_to_parents
+    _worker_state["parent_to_children"] = parent_to_children
+    _worker_state["qid_bytes"] = qid_bytes
+    _worker_state["qid_to_id"] = qid_to_id
+    _worker_state["allowed_mask"] = allowed_mask
+
+
+def _process_class(
+    idx: int,
+    node: str,
+    count: int,
+    num_classes: int,
+    output_dir: str,
+    direction: str,
+    max_depth: Optional[int],
+    max_paths_per_class: Optional[int],
+    batch_size: int,
+    allowed_threshold: Optional[float],
+    remove_the_last_downward_path: bool,
+    compression: str = "none",
+    dedup: bool = False,
+) -> dict:
+    """
+    Generates, combines and exports the paths of a single class, and writes its log
+    file. Uses the graph stored by `_init_worker`.
+
+    Args:
+        idx (int): 1-based position of the class among the top classes.
+        node (str): QID of the class.
+        count (int): Instance count of the class.
+        See `sample_and_combine_paths` for the remaining arguments.
+
+    Returns:
+        dict: The statistics logged for the class.
+    """
+    child_to_parents = _worker_state["child_to_parents"]
+    parent_to_children = _worker_state["parent_to_children"]
+    qid_bytes = _worker_state["qid_bytes"]
+    qid_to_id = _worker_state["qid_to_id"]
+    allowed_mask = _worker_state["allowed_mask"]
+
+    class_start_time = time.time()
+    logger.debug(
+        f"--- Processing Class {idx}/{num_classes}: '{node}' (Count: {count}) ---"
+    )
+
+    # The class directory was created by `sample_and_combine_paths`
+    class_output_dir = os.path.join(output_dir, node)
+    batch_path_prefix = class_output_dir + os.sep + "batch_"
+    batch_path_suffix = ".tsv" + COMPRESSION_SUFFIXES[compression]
+
+    # Generate all complete upward paths if required. Each node's parents are
+    # unique (see `encode_mapping`), the DFS never revisits a node within a path,
+    # and it only yields paths ending at a node without parents, so these are
+    # unique and none is a prefix of another. Paths are kept packed
+    # (see `generate_paths_dfs`) and only unpacked one at a time while writing.
+    upward_paths = pack_paths([])
+    num_upward_paths = 0
+    num_unique_upward_paths = 0
+    if direction in ("upward", "both"):
+        logger.debug(f"Generating upward paths for '{node}'...")
+
+        upward_paths = generate_paths_dfs(
+            qid_to_id[node],
+            child_to_parents,
+            min_depth=1,
+            max_depth=max_depth,
+            max_paths=max_paths_per_class,
+            allowed_mask=allowed_mask,
+            allowed_threshold=allowed_threshold,
+        )
+        num_upward_paths = len(upward_paths[1]) - 1
+
+        logger.debug(f"Found {num_upward_paths} upward paths for '{node}'.")
+
+        if dedup:
+            with gc_paused():
+                upward_paths = pack_paths(
+                    unique_list_of_lists(unpack_paths(upward_paths))
+                )
+        num_unique_upward_paths = len(upward_paths[1]) - 1
+        logger.debug(f"Unique upward paths: {num_unique_upward_paths}")
+    else:
+        logger.debug(f"Skipping upward paths for '{node}' as per direction selection.")
+
+    # Generate all complete downward paths if required
+    unique_downward_paths = pack_paths([])
+    num_downward_paths = 0
+    num_unique_downward_paths = 0
+    if direction in ("downward", "both"):
+        logger.debug(f"Generating downward paths for '{node}'...")
+        downward_paths = generate_paths_dfs(
+            qid_to_id[node],
+            parent_to_children,
+            min_depth=2,
+            max_depth=max_depth,
+            max_paths=max_paths_per_class,
+            allowed_mask=allowed_mask,
+            allowed_threshold=allowed_threshold,
+        )
+
+        # remove the last one since it's the instance level
+        if remove_the_last_downward_path:
+            with gc_paused():
+                truncated_paths = unique_list_of_lists(
+                    [
+                        path[:-1]
+                        for path in unpack_paths(downward_paths)
+                        if len(path) > 1
+                    ]
+                )
+            num_downward_paths = len(truncated_paths)
+        else:
+            num_downward_paths = len(downward_paths[1]) - 1
+
+        logger.debug(f"Found {num_downward_paths} downward paths for '{node}'.")
+
+        # Truncated paths can be a prefix of another path; drop those.
+        # Otherwise the DFS paths are already unique.
+        if remove_the_last_downward_path:
+            unique_downward_paths = pack_paths(remove_prefix_paths(truncated_paths))
+            del truncated_paths
+        elif dedup:
+            with gc_paused():
+                unique_downward_paths = pack_paths(
+                    unique_list_of_lists(unpack_paths(downward_paths))
+                )
+        else:
+            unique_downward_paths = downward_paths
+        del downward_paths
+        num_unique_downward_paths = len(unique_downward_paths[1]) - 1
+        logger.debug(f"Unique downward paths: {num_unique_downward_paths}")
+    else:
+        logger.debug(
+            f"Skipping downward paths for '{node}' as per direction selection."
+        )
+
+    # Determine the combination logic based on direction
+    if direction == "both":
+        # Shuffle the upward and downward paths separately
+        logger.debug(f"Shuffling upward and downward paths for '{node}'...")
+        shuffled_upward_paths = shuffled_paths(upward_paths)
+        shuffled_downward_paths = shuffled_paths(unique_downward_paths)
+        logger.debug(f"Shuffled upward and downward paths.")
+
+        # Combine upward and downward paths on-the-fly and batch them
+        logger.debug(f"Combining and batching paths for '{node}'...")
+        combined_paths_count = 0
+        num_batches = 0
+        batch_paths = []  # Chunks of rendered rows
+        batch_count = 0  # Number of rows in batch_paths
+
+        # Render every downward path once, so that each combined row is just
+        # the rendered upward prefix followed by a rendered downward path.
+        down_rows = [
+            path_to_tsv_row(down_path, qid_bytes)
+            for down_path in shuffled_downward_paths
+        ]
+
+        for up_path in shuffled_upward_paths:
+            # Reverse and remove last element (so we don't double-count the node)
+            up_prefix = b"".join(qid_bytes[i] + b"\t" for i in up_path[-1:0:-1])
+            start = 0
+            while start < len(down_rows):
+                # Rows end with a newline, so joining the downward rows with the
+                # prefix renders a whole run of combined rows in one call.
+                stop = min(start + batch_size - batch_count, len(down_rows))
+                batch_paths.append(up_prefix + up_prefix.join(down_rows[start:stop]))
+                batch_count += stop - start
+                combined_paths_count += stop - start
+                start = stop
+
+                # If batch size is reached, write to TSV
+                if batch_count == batch_size:
+                    num_batches += 1
+                    tsv_filepath = (
+                        f"{batch_path_prefix}{num_batches}{batch_path_suffix}"
+                    )
+                    try:
+                        write_batch(batch_paths, tsv_filepath, compression)
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(
+                                f"Exported batch {num_batches} with {batch_count} paths to '{tsv_filepath}'."
+                            )
+                    except Exception as e:
+                        logger.error(f"Error writing to TSV file '{tsv_filepath}': {e}")
+                        # Continue processing other batches
+                    batch_paths = []  # Reset batch
+                    batch_count = 0
+
+        # Write any remaining paths that didn't fill a full batch
+        if batch_paths:
+            num_batches += 1
+            tsv_filepath = f"{batch_path_prefix}{num_batches}{batch_path_suffix}"
+            try:
+                write_batch(batch_paths, tsv_filepath, compression)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        f"Exported batch {num_batches} with {batch_count} paths to '{tsv_filepath}'."
+                    )
+            except Exception as e:
+                logger.error(f"Error writing to TSV file '{tsv_filepath}': {e}")
+                # Continue processing
+
+        logger.info(
+            f"Exported {combined_paths_count} combined paths as {num_batches} TSV batch file(s) to '{class_output_dir}'."
+        )
+    elif direction == "upward":
+        # Shuffle the upward paths
+        logger.debug(f"Shuffling upward paths for '{node}'...")
+        shuffled_upward_paths = shuffled_paths(upward_paths)
+        logger.debug(f"Shuffled upward paths.")
+
+        # Batch the upward paths
+        logger.debug(f"Batching upward paths for '{node}'...")
+        combined_paths_count = num_unique_upward_paths
+        num_batches = 0
+        batch_paths = []
+
+        for up_path in shuffled_upward_paths:
+            # Reverse to put 'node' at front
+            batch_paths.append(path_to_tsv_row(up_path[::-1], qid_bytes))
+
+            # If batch size is reached, write to TSV
+            if len(batch_paths) == batch_size:
+                num_batches += 1
+                tsv_filepath = f"{batch_path_prefix}{num_batches}{batch_path_suffix}"
+                try:
+                    write_batch(batch_paths, tsv_filepath, compression)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(
+                            f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
+                        )
+                except Exception as e:
+                    logger.error(f"Error writing to TSV file '{tsv_filepath}': {e}")
+                    # Continue processing other batches
+                batch_paths = []  # Reset batch
+
+        # Write any remaining paths that didn't fill a full batch
+        if batch_paths:
+            num_batches += 1
+            tsv_filepath = f"{batch_path_prefix}{num_batches}{batch_path_suffix}"
+            try:
+                write_batch(batch_paths, tsv_filepath, compression)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
+                    )
+            except Exception as e:
+                logger.error(f"Error writing to TSV file '{tsv_filepath}': {e}")
+                # Continue processing
+
+        logger.info(
+            f"Exported {combined_paths_count} upward paths as {num_batches} TSV batch file(s) to '{class_output_dir}'."
+        )
+    elif direction == "downward":
+        # Shuffle the downward paths
+        logger.debug(f"Shuffling downward paths for '{node}'...")
+        shuffled_downward_paths = shuffled_paths(unique_downward_paths)
+        logger.debug(f"Shuffled downward paths.")
+
+        # Batch the downward paths
+        logger.debug(f"Batching downward paths for '{node}'...")
+        combined_paths_count = num_unique_downward_paths
+        num_batches = 0
+        batch_paths = []
+
+        for down_path in shuffled_downward_paths:
+            batch_paths.append(path_to_tsv_row(down_path, qid_bytes))
+
+            # If batch size is reached, write to TSV
+            if len(batch_paths) == batch_size:
+                num_batches += 1
+                tsv_filepath = f"{batch_path_prefix}{num_batches}{batch_path_suffix}"
+                try:
+                    write_batch(batch_paths, tsv_filepath, compression)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(
+                            f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
+                        )
+                except Exception as e:
+                    logger.error(f"Error writing to TSV file '{tsv_filepath}': {e}")
+                    # Continue processing other batches
+                batch_paths = []  # Reset batch
+
+        # Write any remaining paths that didn't fill a full batch
+        if batch_paths:
+            num_batches += 1
+            tsv_filepath = f"{batch_path_prefix}{num_batches}{batch_path_suffix}"
+            try:
+                write_batch(batch_paths, tsv_filepath, compression)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
+                    )
+            except Exception as e:
+                logger.error(f"Error writing to TSV file '{tsv_filepath}': {e}")
+                # Continue processing
+
+        logger.info(
+            f"Exported {combined_paths_count} downward paths as {num_batches} TSV batch file(s) to '{class_output_dir}'."
+        )
+    else:
+        logger.error(
+            f"Invalid direction '{direction}' specified. Skipping combination."
+        )
+        combined_paths_count = 0
+        num_batches = 0
+
+    # Collect statistics
+    class_end_time = time.time()
+    elapsed_time = class_end_time - class_start_time
+    current_memory = get_memory_usage()
+
+    # Prepare log data for the current class
+    log_data = {
+        "class": node,
+        "initial_upward_paths": num_upward_paths,
+        "unique_upward_paths": num_unique_upward_paths,
+        "initial_downward_paths": num_downward_paths,
+        "unique_downward_paths": num_unique_downward_paths,
+        "combined_paths": combined_paths_count,
+        "num_batches": num_batches,
+        "batch_size": batch_size,
+        "direction": direction,
+        "time_taken_seconds": elapsed_time,
+        "memory_usage_mb": current_memory,
+    }
+
+    # Define the log file path
+    log_file = os.path.join(class_output_dir, f"{node}.log")
+
+    # Write log statistics to the class-specific log file
+    try:
+        with open(log_file, "w", encoding="utf-8") as log:
+            log.write(f"Class: {log_data['class']}\n")
+            log.write(f"Initial Upward Paths: {log_data['initial_upward_paths']}\n")
+            log.write(f"Unique Upward Paths: {log_data['unique_upward_paths']}\n")
+            log.write(f"Initial Downward Paths: {log_data['initial_downward_paths']}\n")
+            log.write(f"Unique Downward Paths: {log_data['unique_downward_paths']}\n")
+            log.write(f"Combined Paths: {log_data['combined_paths']}\n")
+            log.write(f"Number of Batches: {log_data['num_batches']}\n")
+            log.write(f"Batch Size: {log_data['batch_size']}\n")
+            log.write(f"Direction: {log_data['direction']}\n")
+            log.write(f"Time Taken: {format_time(log_data['time_taken_seconds'])}\n")
+            log.write(f"Memory Usage: {log_data['memory_usage_mb']:.2f} MB\n")
+        logger.debug(f"Logged statistics to '{log_file}'.")
+    except Exception as e:
+        logger.error(f"Error writing to log file '{log_file}': {e}")
+
+    logger.info(
+        f"Time taken for '{node}': {format_time(elapsed_time)}, "
+        f"current memory usage: {current_memory:.2f} MB"
+    )
+
+    return log_data
+
+
 def sample_and_combine_paths(
     num_classes: int,
     class_counts: dict[str, int],
-    child_to_parents: dict[str, list[str]],
-    parent_to_children: dict[str, list[str]],
+    child_to_parents: tuple[np.ndarray, np.ndarray],
+    parent_to_children: tuple[np.ndarray, np.ndarray],
+    id_to_qid: list[str],
+    qid_to_id: dict[str, int],
     output_dir: str,
     direction: str,
     max_depth: Optional[int] = None,
@@ -277,6 +1005,9 @@ def sample_and_combine_paths(
     allowed_threshold: Optional[float] = None,
     remove_the_last_downward_path: bool = False,
     nodes_to_avoid: list[str] = [],
+    num_workers: int = 1,
+    compression: str = "none",
+    dedup: bool = False,
 ) -> None:
     """
     Samples upward and/or downward paths from the top N classes, combines them in a
@@ -286,8 +1017,11 @@ def sample_and_combine_paths(
     Args:
         num_classes (int): Number of top classes to process.
         class_counts (dict[str, int]): Mapping of classes to their counts.
-        child_to_parents (dict[str, list[str]]): Child to parents mapping.
-        parent_to_children (dict[str, list[str]]): Parent to children mapping.
+        child_to_parents (tuple[np.ndarray, np.ndarray]): Child to parents CSR graph.
+        parent_to_children (tuple[np.ndarray, np.ndarray]): Parent to children CSR
+            graph.
+        id_to_qid (list[str]): Table mapping entity ids back to QIDs.
+        qid_to_id (dict[str, int]): Table mapping QIDs to entity ids.
         output_dir (str): Directory where TSV and log files will be saved.
         direction (str): Direction of paths to include ('upward', 'downward', 'both').
         max_depth (Optional[int]): Maximum depth for path generation.
@@ -298,347 +1032,78 @@ def sample_and_combine_paths(
             path.
         remove_the_last_downward_path (bool): Remove the last downward path.
         nodes_to_avoid (list[str]): List of nodes to avoid due to excessive paths.
+        num_workers (int): Number of worker processes. Classes are processed in the
+            main process if this is 1.
+        compression (str): Compression of the batch files ('none', 'gzip', 'zstd').
+        dedup (bool): Drop duplicate paths with a set of tuples. The adjacency lists
+            are deduplicated by `encode_mapping`, so the DFS never yields the same
+            path twice and this is only a safety net.
     """
-    print(f"Starting path sampling and combination for top {num_classes} classes.")
-    print(f"nodes to avoid: {nodes_to_avoid}")
+    logger.info(
+        f"Starting path sampling and combination for top {num_classes} classes."
+    )
+    logger.info(f"nodes to avoid: {nodes_to_avoid}")
 
     # Compute allowed nodes (top num_classes) from class_counts keys
-    allowed_nodes = set(node for node, _ in islice(class_counts.items(), num_classes))
+    allowed_mask = np.zeros(len(id_to_qid), dtype=np.bool_)
+    for node, _ in islice(class_counts.items(), num_classes):
+        allowed_mask[qid_to_id[node]] = True
 
-    with tqdm(total=num_classes, desc="Processing Classes") as pbar:
+    classes = [
+        (idx, node, count)
         for idx, (node, count) in enumerate(
             islice(class_counts.items(), num_classes), start=1
-        ):
-            if node in nodes_to_avoid:
-                continue
-
-            class_start_time = time.time()
-            print(
-                f"\n--- Processing Class {idx}/{num_classes}: '{node}' (Count: {count}) ---"
-            )
-
-            class_output_dir = os.path.join(output_dir, node)
-            os.makedirs(class_output_dir, exist_ok=True)
-            print(f"Created directory '{class_output_dir}' for class '{node}'.")
-
-            # Generate all complete upward paths if required
-            upward_paths = []
-            unique_upward_paths = []
-            if direction in ("upward", "both"):
-                print(f"Generating upward paths for '{node}'...")
-
-                upward_paths_gen = generate_paths_dfs(
-                    node,
-                    child_to_parents,
-                    min_depth=1,
-                    max_depth=max_depth,
-                    max_paths=max_paths_per_class,
-                    allowed_nodes=allowed_nodes,
-                    allowed_threshold=allowed_threshold,
-                )
-                upward_paths = list(upward_paths_gen)
-
-                print(f"Found {len(upward_paths)} upward paths for '{node}'.")
-
-                # Initialize PathTrie for upward paths to ensure uniqueness
-                upward_trie = PathTrie()
-                for path in upward_paths:
-                    upward_trie.insert(path)
-                unique_upward_paths = upward_trie.traverse()
-                print(
-                    f"Unique upward paths after Trie insertion: {len(unique_upward_paths)}"
-                )
-            else:
-                print(f"Skipping upward paths for '{node}' as per direction selection.")
-
-            # Generate all complete downward paths if required
-            downward_paths = []
-            unique_downward_paths = []
-            if direction in ("downward", "both"):
-                print(f"Generating downward paths for '{node}'...")
-                downward_paths_gen = generate_paths_dfs(
-                    node,
-                    parent_to_children,
-                    min_depth=2,
-                    max_depth=max_depth,
-                    max_paths=max_paths_per_class,
-                    allowed_nodes=allowed_nodes,
-                    allowed_threshold=allowed_threshold,
-                )
-                downward_paths = list(downward_paths_gen)
-
-                # remove the last one since it's the instance level
-                if remove_the_last_downward_path:
-                    downward_paths = unique_list_of_lists(
-                        [path[:-1] for path in downward_paths if len(path[:-1]) > 0]
-                    )
-
-                print(f"Found {len(downward_paths)} downward paths for '{node}'.")
-
-                # Initialize PathTrie for downward paths to ensure uniqueness
-                downward_trie = PathTrie()
-                for path in downward_paths:
-                    downward_trie.insert(path)
-                unique_downward_paths = downward_trie.traverse()
-                print(
-                    f"Unique downward paths after Trie insertion: "
-                    f"{len(unique_downward_paths)}"
-                )
-            else:
-                print(
-                    f"Skipping downward paths for '{node}' as per direction selection."
-                )
-
-            # Determine the combination logic based on direction
-            if direction == "both":
-                # Shuffle the upward and downward paths separately
-                print(f"Shuffling upward and downward paths for '{node}'...")
-                random.shuffle(unique_upward_paths)
-                random.shuffle(unique_downward_paths)
-                print(f"Shuffled upward and downward paths.")
-
-                # Combine upward and downward paths on-the-fly and batch them
-                print(f"Combining and batching paths for '{node}'...")
-                combined_paths_count = 0
-                num_batches = 0
-                batch_paths = []
-
-                for up_path in unique_upward_paths:
-                    # Reverse and remove last element (so we don't double-count the node)
-                    reversed_up_path = up_path[::-1][:-1]
-                    for down_path in unique_downward_paths:
-                        combined_path = reversed_up_path + down_path
-                        batch_paths.append(combined_path)
-                        combined_paths_count += 1
-
-                        # If batch size is reached, write to TSV
-                        if len(batch_paths) == batch_size:
-                            num_batches += 1
-                            tsv_filename = f"batch_{num_batches}.tsv"
-                            tsv_filepath = os.path.join(class_output_dir, tsv_filename)
-                            try:
-                                with open(
-                                    tsv_filepath, "w", encoding="utf-8", newline=""
-                                ) as tsv_file:
-                                    writer = csv.writer(tsv_file, delimiter="\t")
-                                    writer.writerows(batch_paths)
-                                print(
-                                    f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
-                                )
-                            except Exception as e:
-                                print(
-                                    f"Error writing to TSV file '{tsv_filepath}': {e}"
-                                )
-                                # Continue processing other batches
-                            batch_paths = []  # Reset batch
-
-                # Write any remaining paths that didn't fill a full batch
-                if batch_paths:
-                    num_batches += 1
-                    tsv_filename = f"batch_{num_batches}.tsv"
-                    tsv_filepath = os.path.join(class_output_dir, tsv_filename)
-                    try:
-                        with open(
-                            tsv_filepath, "w", encoding="utf-8", newline=""
-                        ) as tsv_file:
-                            writer = csv.writer(tsv_file, delimiter="\t")
-                            writer.writerows(batch_paths)
-                        print(
-                            f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
-                        )
-                    except Exception as e:
-                        print(f"Error writing to TSV file '{tsv_filepath}': {e}")
-                        # Continue processing
-
-                print(
-                    f"Exported {combined_paths_count} combined paths as {num_batches} TSV batch file(s) to '{class_output_dir}'."
-                )
-            elif direction == "upward":
-                # Shuffle the upward paths
-                print(f"Shuffling upward paths for '{node}'...")
-                random.shuffle(unique_upward_paths)
-                print(f"Shuffled upward paths.")
-
-                # Batch the upward paths
-                print(f"Batching upward paths for '{node}'...")
-                combined_paths_count = len(unique_upward_paths)
-                num_batches = 0
-                batch_paths = []
-
-                for up_path in unique_upward_paths:
-                    reversed_up_path = up_path[::-1]  # Reverse to put 'node' at front
-                    batch_paths.append(reversed_up_path)
-
-                    # If batch size is reached, write to TSV
-                    if len(batch_paths) == batch_size:
-                        num_batches += 1
-                        tsv_filename = f"batch_{num_batches}.tsv"
-                        tsv_filepath = os.path.join(class_output_dir, tsv_filename)
-                        try:
-                            with open(
-                                tsv_filepath, "w", encoding="utf-8", newline=""
-                            ) as tsv_file:
-                                writer = csv.writer(tsv_file, delimiter="\t")
-                                writer.writerows(batch_paths)
-                            print(
-                                f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
-                            )
-                        except Exception as e:
-                            print(f"Error writing to TSV file '{tsv_filepath}': {e}")
-                            # Continue processing other batches
-                        batch_paths = []  # Reset batch
-
-                # Write any remaining paths that didn't fill a full batch
-                if batch_paths:
-                    num_batches += 1
-                    tsv_filename = f"batch_{num_batches}.tsv"
-                    tsv_filepath = os.path.join(class_output_dir, tsv_filename)
-                    try:
-                        with open(
-                            tsv_filepath, "w", encoding="utf-8", newline=""
-                        ) as tsv_file:
-                            writer = csv.writer(tsv_file, delimiter="\t")
-                            writer.writerows(batch_paths)
-                        print(
-                            f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
-                        )
-                    except Exception as e:
-                        print(f"Error writing to TSV file '{tsv_filepath}': {e}")
-                        # Continue processing
-
-                print(
-                    f"Exported {combined_paths_count} upward paths as {num_batches} TSV batch file(s) to '{class_output_dir}'."
-                )
-            elif direction == "downward":
-                # Shuffle the downward paths
-                print(f"Shuffling downward paths for '{node}'...")
-                random.shuffle(unique_downward_paths)
-                print(f"Shuffled downward paths.")
-
-                # Batch the downward paths
-                print(f"Batching downward paths for '{node}'...")
-                combined_paths_count = len(unique_downward_paths)
-                num_batches = 0
-                batch_paths = []
-
-                for down_path in unique_downward_paths:
-                    batch_paths.append(down_path)
-
-                    # If batch size is reached, write to TSV
-                    if len(batch_paths) == batch_size:
-                        num_batches += 1
-                        tsv_filename = f"batch_{num_batches}.tsv"
-                        tsv_filepath = os.path.join(class_output_dir, tsv_filename)
-                        try:
-                            with open(
-                                tsv_filepath, "w", encoding="utf-8", newline=""
-                            ) as tsv_file:
-                                writer = csv.writer(tsv_file, delimiter="\t")
-                                writer.writerows(batch_paths)
-                            print(
-                                f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
-                            )
-                        except Exception as e:
-                            print(f"Error writing to TSV file '{tsv_filepath}': {e}")
-                            # Continue processing other batches
-                        batch_paths = []  # Reset batch
-
-                # Write any remaining paths that didn't fill a full batch
-                if batch_paths:
-                    num_batches += 1
-                    tsv_filename = f"batch_{num_batches}.tsv"
-                    tsv_filepath = os.path.join(class_output_dir, tsv_filename)
-                    try:
-                        with open(
-                            tsv_filepath, "w", encoding="utf-8", newline=""
-                        ) as tsv_file:
-                            writer = csv.writer(tsv_file, delimiter="\t")
-                            writer.writerows(batch_paths)
-                        print(
-                            f"Exported batch {num_batches} with {len(batch_paths)} paths to '{tsv_filepath}'."
-                        )
-                    except Exception as e:
-                        print(f"Error writing to TSV file '{tsv_filepath}': {e}")
-                        # Continue processing
-
-                print(
-                    f"Exported {combined_paths_count} downward paths as {num_batches} TSV batch file(s) to '{class_output_dir}'."
-                )
-            else:
-                print(
-                    f"Invalid direction '{direction}' specified. Skipping combination."
-                )
-                combined_paths_count = 0
-                num_batches = 0
-
-            # Collect statistics
-            class_end_time = time.time()
-            elapsed_time = class_end_time - class_start_time
-            current_memory = get_memory_usage()
-
-            # Prepare log data for the current class
-            log_data = {
-                "class": node,
-                "initial_upward_paths": len(upward_paths),
-                "unique_upward_paths": len(unique_upward_paths),
-                "initial_downward_paths": len(downward_paths),
-                "unique_downward_paths": len(unique_downward_paths),
-                "combined_paths": combined_paths_count,
-                "num_batches": num_batches,
-                "batch_size": batch_size,
-                "direction": direction,
-                "time_taken_seconds": elapsed_time,
-                "memory_usage_mb": current_memory,
-            }
-
-            # Define the log file path
-            log_file = os.path.join(class_output_dir, f"{node}.log")
-
-            # Write log statistics to the class-specific log file
-            try:
-                with open(log_file, "w", encoding="utf-8") as log:
-                    log.write(f"Class: {log_data['class']}\n")
-                    log.write(
-                        f"Initial Upward Paths: {log_data['initial_upward_paths']}\n"
-                    )
-                    log.write(
-                        f"Unique Upward Paths: {log_data['unique_upward_paths']}\n"
-                    )
-                    log.write(
-                        f"Initial Downward Paths: {log_data['initial_downward_paths']}\n"
-                    )
-                    log.write(
-                        f"Unique Downward Paths: {log_data['unique_downward_paths']}\n"
-                    )
-                    log.write(f"Combined Paths: {log_data['combined_paths']}\n")
-                    log.write(f"Number of Batches: {log_data['num_batches']}\n")
-                    log.write(f"Batch Size: {log_data['batch_size']}\n")
-                    log.write(f"Direction: {log_data['direction']}\n")
-                    log.write(
-                        f"Time Taken: {format_time(log_data['time_taken_seconds'])}\n"
-                    )
-                    log.write(f"Memory Usage: {log_data['memory_usage_mb']:.2f} MB\n")
-                print(f"Logged statistics to '{log_file}'.")
-            except Exception as e:
-                print(f"Error writing to log file '{log_file}': {e}")
-
-            print(f"Time taken for '{node}': {format_time(elapsed_time)}")
-            print(f"Current Memory Usage: {current_memory:.2f} MB")
-
-            # *** Insert Garbage Collection Here ***
-            # Conditionally delete variables based on direction
-            if direction in ("upward", "both"):
-                del upward_paths, unique_upward_paths
-                if upward_trie:
-                    del upward_trie
-            if direction in ("downward", "both"):
-                del downward_paths, unique_downward_paths
-                if downward_trie:
-                    del downward_trie
-            del batch_paths, log_data
-            gc.collect()  # Force garbage collection
+        )
+        if node not in nodes_to_avoid
+    ]
+
+    # Create every class directory up front, before any worker starts
+    for _, node, _ in classes:
+        os.makedirs(os.path.join(output_dir, node), exist_ok=True)
+    logger.debug(f"Created {len(classes)} class directories in '{output_dir}'.")
+
+    # Encode the QIDs once here rather than in every worker, so that forked workers
+    # share this table instead of each building a copy of it
+    qid_bytes = [qid.encode("utf-8") for qid in id_to_qid]
+    initargs = (
+        child_to_parents,
+        parent_to_children,
+        qid_bytes,
+        qid_to_id,
+        allowed_mask,
+        logger.getEffectiveLevel(),
+    )
+    class_kwargs = dict(
+        num_classes=num_classes,
+        output_dir=output_dir,
+        direction=direction,
+        max_depth=max_depth,
+        max_paths_per_class=max_paths_per_class,
+        batch_size=batch_size,
+        allowed_threshold=allowed_threshold,
+        remove_the_last_downward_path=remove_the_last_downward_path,
+        compression=compression,
+        dedup=dedup,
+    )
 
-            pbar.update(1)
+    # Classes are independent, so they are processed in parallel unless a single
+    # worker is requested
+    if num_workers <= 1:
+        _init_worker(*initargs)
+        for idx, node, count in tqdm(classes, desc="Processing Classes"):
+            _process_class(idx, node, count, **class_kwargs)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=num_workers, initializer=_init_worker, initargs=initargs
+        ) as executor:
+            futures = [
+                executor.submit(_process_class, idx, node, count, **class_kwargs)
+                for idx, node, count in classes
+            ]
+            for future in tqdm(
+                as_completed(futures), total=len(futures), desc="Processing Classes"
+            ):
+                future.result()
 
 
 def main():
@@ -713,6 +1178,36 @@ def main():
         default=[],
         help="List of nodes to avoid due to excessive paths (default: [])",
     )
+    parser.add_argument(
+        "--log_level",
+        type=str.upper,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging level; per-batch and per-step messages are logged at DEBUG "
+        "(default: INFO)",
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of processes that generate paths for classes in parallel; each "
+        "holds the graph in memory (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        default="none",
+        choices=list(COMPRESSION_SUFFIXES),
+        help="Compress the batch files as batch_N.tsv.gz or batch_N.tsv.zst; the "
+        "downstream scripts read plain .tsv files (default: none)",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Drop duplicate upward and downward paths. Repeated parents are merged "
+        "when the graph is built and the DFS never revisits a node within a path, so "
+        "it never generates the same path twice and this is off by default",
+    )
     args = parser.parse_args()
 
     num_classes = args.num_classes
@@ -726,30 +1221,52 @@ def main():
     class_counts_path = args.class_counts_json
     child_to_parents_path = args.child_to_parents_json
     nodes_to_avoid = args.nodes_to_avoid
+    num_workers = args.num_workers
+    compression = args.compression
+    dedup = args.dedup
+
+    logging.basicConfig(level=args.log_level, format="%(message)s")
 
     # Validate direction argument
     if DIRECTION not in ("upward", "downward", "both"):
-        print(
+        logger.error(
             f"Invalid direction '{DIRECTION}'. Must be 'upward', 'downward', or 'both'."
         )
         sys.exit(1)
 
+    # A batch must hold at least one path, or splitting paths into batches never
+    # makes progress
+    if BATCH_SIZE < 1:
+        logger.error(f"Invalid batch size {BATCH_SIZE}. Must be at least 1.")
+        sys.exit(1)
+
+    if compression == "zstd" and zstandard is None:
+        logger.error("--compression zstd requires the zstandard package.")
+        sys.exit(1)
+
     # Start total timer
     total_start_time = time.time()
 
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
-    print(f"Output directory '{output_dir}' is ready.")
+    logger.info(f"Output directory '{output_dir}' is ready.")
 
-    with open(child_to_parents_path, "r", encoding="utf-8") as f:
-        child_to_parents = json.load(f)
+    child_to_parents = load_json(child_to_parents_path)
+    class_counts = load_json(class_counts_path)
 
-    with open(class_counts_path, "r", encoding="utf-8") as f:
-        class_counts = json.load(f)
+    # Replace QID strings with int ids; they are decoded again only when writing TSVs
+    id_to_qid, qid_to_id = build_entity_index(
+        child_to_parents,
+        [node for node, _ in islice(class_counts.items(), num_classes)],
+    )
+    child_to_parents = mapping_to_csr(
+        encode_mapping(child_to_parents, qid_to_id), len(id_to_qid)
+    )
+    logger.info(f"Indexed {len(id_to_qid)} entities.")
 
     # Automatically generate parent_to_children mapping
     parent_to_children = invert_mapping(child_to_parents)
-    print("Inverted child_to_parents to parent_to_children mapping.")
+    logger.info("Inverted child_to_parents to parent_to_children mapping.")
 
     # Perform path sampling, combination, batching, and insertion
     sample_and_combine_paths(
@@ -757,6 +1274,8 @@ def main():
         class_counts=class_counts,
         child_to_parents=child_to_parents,
         parent_to_children=parent_to_children,
+        id_to_qid=id_to_qid,
+        qid_to_id=qid_to_id,
         output_dir=output_dir,
         direction=DIRECTION,
         max_depth=MAX_DEPTH,
@@ -765,14 +1284,17 @@ def main():
         allowed_threshold=ALLOWED_THRESHOLD,
         remove_the_last_downward_path=REMOVE_THE_LAST_DOWNWARD_PATH,
         nodes_to_avoid=nodes_to_avoid,
+        num_workers=num_workers,
+        compression=compression,
+        dedup=dedup,
     )
 
     # End total timer
     total_end_time = time.time()
     total_elapsed_time = total_end_time - total_start_time
 
-    print(f"\nTotal time taken: {format_time(total_elapsed_time)}")
-    print("Script execution completed successfully.")
+    logger.info(f"Total time taken: {format_time(total_elapsed_time)}")
+    logger.info("Script execution completed successfully.")
 
 
 if __name__ == "__main__":
@@ -1,25 +1,133 @@
 """
 This script extracts `P31` (instance of) claims
-from a Wikidata JSON dump and saves them as TSV batch files in a specified directory.
-It uses native `json` for parsing and supports a `dummy` mode for quick testing.
+from a Wikidata JSON dump and saves them as TSV (or Parquet) batch files in a specified
+directory.
+Most lines are handled by scanning the raw bytes for `P31` main snaks, and only lines
+that do not follow the dump's usual layout are parsed: lazily with `pysimdjson` if
+installed, otherwise with `orjson` if installed, and native `json` as a last resort.
+It supports a `dummy` mode for quick testing.
+The dump is decompressed with `pigz` in a separate process when it is on the PATH,
+otherwise with `python-isal` if installed, and with `gzip` as a last resort.
+
+The dump can also be split once into compressed shards of whole lines, which are
+then processed in parallel, e.g.:
+    mkdir shards
+    pigz -dc latest-all.json.gz | split -l 5000000 -d -a 4 \
+        --filter='pigz > $FILE.gz' - shards/part_
+    python run_p31.py --dump_file shards/part_*.gz --jobs 4
 
 Usage:
-    python extract_p31.py --dump_file <file> --p31_dir <directory>
-                          [--num_entities_per_batch <int>] [--dummy]
+    python extract_p31.py --dump_file <file> [<file> ...] --p31_dir <directory>
+                          [--num_entities_per_batch <int>] [--num_workers <int>]
+                          [--compression {none,gzip}] [--format {tsv,parquet}]
+                          [--jobs <int>] [--dummy]
 
 Arguments:
-    --dump_file (str): Path to the compressed Wikidata JSON dump file
-                       (default: 'latest-all.json.gz').
+    --dump_file (str): Path to the compressed Wikidata JSON dump file, or to its
+                       shards in dump order (default: 'latest-all.json.gz').
     --p31_dir (str): Directory to save `P31` triples (default: 'P31').
     --num_entities_per_batch (int): Entities per batch file (default: 50000).
+    --num_workers (int): Processes that extract triples from chunks of lines
+                         (default: number of CPUs).
+    --compression (str): Write batch files as `batch_<i>.tsv.gz`, compressed with
+                         `pigz` if available (default: 'none').
+    --format (str): Write batch files as TSV, or as `batch_<i>.parquet` with
+                    `pyarrow` (default: 'tsv').
+    --jobs (int): Shards processed in parallel, each with its share of
+                  `--num_workers`. Every shard ends with a partially filled batch
+                  (default: 1).
     --dummy: Optional flag to process only one batch.
 """
 
 import gzip
+import io
 import json
 import os
+import re
 import argparse
+import multiprocessing
+import queue
+import shutil
+import subprocess
+import threading
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, closing, contextmanager
+from types import MappingProxyType
+from typing import Iterator, Optional
+
+try:
+    from isal import igzip
+except ImportError:  # python-isal is optional; gzip is used without it
+    igzip = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; json is used without it
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:  # pysimdjson is optional; orjson or json is used without it
+    simdjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; it is only needed for Parquet output
+    pa = pq = None
+
+PIGZ = shutil.which("pigz")
+
+# All parsers take the raw UTF-8 bytes of a line, so lines are never decoded
+_loads = orjson.loads if orjson is not None else json.loads
+
+# Shared read-only default for missing claim fields, instead of a new {} per lookup
+_EMPTY = MappingProxyType({})
+
+# One simdjson parser per process, reused for every line so that its buffers are
+# only reallocated when a longer line comes along
+_simdjson_parser = simdjson.Parser() if simdjson is not None else None
+
+# Size of the blocks the decompressed dump stream is read in; the lines of a block
+# are sent to a worker as one chunk
+READ_BUFFER_SIZE = 1 << 20
+
+# Number of line chunks the reader thread may get ahead of extraction, and number of
+# extracted chunks the writer thread may fall behind
+READ_AHEAD_CHUNKS = 8
+WRITE_BEHIND_CHUNKS = 8
+
+# Progress is printed for every this many batch files, so that a slow terminal or
+# pipe does not hold up batch processing
+PRINT_EVERY_BATCHES = 50
+
+TSV_HEADER = b"entity_id\tproperty_id\tvalue_id\n"
+
+# File name suffix appended to ".tsv" for each --compression choice
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz"}
+
+# Wikibase serializes an entity line as {"type":...,"id":...,...} and a main snak as
+# {"snaktype":...,"property":...,"hash":...,"datavalue":{"value":{...}},...}. A claim
+# group only holds claims of its own property, so every main snak of P31 is a claim
+# under claims.P31. Unescaped quotes cannot occur inside JSON strings, so these
+# patterns never match inside labels or descriptions.
+_ENTITY_ID_RE = re.compile(rb'\{"type":"[a-z]+","id":"([^"]+)"')
+_P31_SNAK = b'"property":"P31"'
+_P31_MAINSNAK_RE = re.compile(
+    rb'"mainsnak":\{"snaktype":"(value|somevalue|novalue)","property":"P31"'
+)
+_P31_VALUE_RE = re.compile(
+    rb'"mainsnak":\{"snaktype":"value","property":"P31",(?:"hash":"[0-9a-f]*",)?'
+    rb'"datavalue":\{"value":\{[^{}]*?"id":"([^"]+)"'
+)
+
+# Endings of a complete entity line (without its newline, which `read_line_chunks`
+# removes, but possibly with the carriage return of a CRLF line), which the raw byte
+# scan requires. A truncated or corrupt line is parsed instead, so that it is
+# reported as a decoding error; only one that happens to end in "}" is still scanned.
+_ENTITY_LINE_ENDS = (b"}", b"},", b"}\r", b"},\r")
 
 
 def format_time(seconds: float) -> str:
@@ -40,96 +148,575 @@ def format_time(seconds: float) -> str:
     return ", ".join(parts)
 
 
-def extract_property_triples(entity: dict, property_id: str) -> list:
+@contextmanager
+def open_dump(dump_file: str):
+    """
+    Open the gzip-compressed dump as a binary stream, using the fastest available
+    decompressor. `pigz` runs in its own process, so decompression overlaps parsing.
+    Either way, the stream is buffered in blocks of `READ_BUFFER_SIZE` bytes, so each
+    refill decompresses a large block instead of a few kilobytes.
+    """
+    if PIGZ is None:
+        opener = igzip.open if igzip is not None else gzip.open
+        with opener(dump_file, "rb") as gz:
+            with io.BufferedReader(gz, buffer_size=READ_BUFFER_SIZE) as f:
+                yield f
+        return
+
+    proc = subprocess.Popen(
+        [PIGZ, "-dc", dump_file], stdout=subprocess.PIPE, bufsize=READ_BUFFER_SIZE
+    )
+    try:
+        with proc.stdout as f:
+            yield f
+    finally:
+        # Stop pigz if the dump was not read to the end (e.g., in dummy mode)
+        if proc.poll() is None:
+            proc.terminate()
+        proc.wait()
+    if proc.returncode > 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+
+def extract_p31_triples(entity: dict) -> list:
     """
-    Extract triples for a specific property (`P31`) from an entity.
+    Extract `P31` triples from an entity, as `(entity_id, value_id)` pairs of UTF-8
+    encoded ids. The property is the same for all of them, so it is only added when
+    rows are rendered.
     """
-    triples = []
-    entity_id = entity.get("id")
     claims = entity.get("claims", {})
+    return extract_claim_triples(entity.get("id"), claims.get("P31", []))
+
+
+def extract_claim_triples(entity_id: str, claims: list) -> list:
+    """
+    Extract `(entity_id, value_id)` pairs of UTF-8 encoded ids from the `P31` claims
+    of an entity.
+    """
+    value_ids = []
+    for claim in claims:
+        mainsnak = claim.get("mainsnak", _EMPTY)
+        if mainsnak.get("snaktype") == "value":
+            value = mainsnak.get("datavalue", _EMPTY).get("value")
 
-    if property_id in claims:
-        for claim in claims[property_id]:
-            mainsnak = claim.get("mainsnak", {})
-            if mainsnak.get("snaktype") == "value":
-                datavalue = mainsnak.get("datavalue", {})
-                value = datavalue.get("value", {})
+            # Ensure the value is a valid entity reference
+            if isinstance(value, dict) and "id" in value:
+                value_ids.append(value["id"].encode("utf-8"))
 
-                # Ensure the value is a valid entity reference
-                if isinstance(value, dict) and "id" in value:
-                    triples.append((entity_id, property_id, value["id"]))
+    if not value_ids:
+        return []
+    # The entity id is encoded once, however many claims there are
+    entity_id = entity_id.encode("utf-8")
+    return [(entity_id, value_id) for value_id in value_ids]
 
-    return triples
 
+def extract_p31_triples_from_line(line: bytes) -> Optional[list]:
+    """
+    Extract `P31` triples from a raw dump line without decoding the whole entity.
+    Returns None if the line does not follow the usual layout (e.g., it is truncated,
+    or `P31` is also used in qualifiers or references), in which case it has to be
+    fully parsed.
+    """
+    if not line.startswith(b"{") or not line.endswith(_ENTITY_LINE_ENDS):
+        return None
+    num_snaks = line.count(_P31_SNAK)
+    if num_snaks == 0:
+        return []
 
-def process_file(
+    match = _ENTITY_ID_RE.match(line)
+    if match is None:
+        return None
+    snaktypes = _P31_MAINSNAK_RE.findall(line)
+    if len(snaktypes) != num_snaks:
+        return None
+    value_ids = _P31_VALUE_RE.findall(line)
+    if len(value_ids) != snaktypes.count(b"value"):
+        return None
+
+    # The ids are kept as the bytes they are written as
+    entity_id = match.group(1)
+    return [(entity_id, value_id) for value_id in value_ids]
+
+
+def parse_p31_triples(line: bytes) -> Optional[list]:
+    """
+    Extract `P31` triples from a dump line (without the trailing comma) by parsing it.
+    With simdjson, only the entity id and the `P31` claims become Python objects;
+    labels, sitelinks, etc. are never materialized. Returns None if the line cannot
+    be decoded.
+    """
+    try:
+        if _simdjson_parser is None:
+            return extract_p31_triples(_loads(line))
+
+        doc = _simdjson_parser.parse(line)
+        entity_id = doc.get("id")
+        try:
+            claims = doc.at_pointer("/claims/P31").as_list()
+        except KeyError:
+            claims = []
+        del doc  # The parser can only be reused once no document refers to it
+        return extract_claim_triples(entity_id, claims)
+    except ValueError:  # Raised by every parser, including json.JSONDecodeError
+        return None
+
+
+def extract_chunk(lines: list) -> tuple:
+    """
+    Extract `P31` triples from a chunk of raw dump lines. Returns the triples of each
+    entity in the chunk, and the lines that could not be decoded.
+    """
+    entity_triples = []
+    bad_lines = []
+    for line in lines:
+        # Entity lines are "{...}," and are used as they are; only other lines
+        # are stripped, to find the JSON array brackets
+        if not line or line[0] != 0x7B:  # b"{"
+            line = line.strip()
+            if line in (b"[", b"]"):  # Skip JSON array brackets
+                continue
+        # Only lines that the byte scan cannot handle are parsed, and only parsing
+        # can fail
+        triples = extract_p31_triples_from_line(line)
+        if triples is None:
+            triples = parse_p31_triples(line.rstrip(b",\r\n"))
+            if triples is None:
+                bad_lines.append(line.strip())
+                continue
+        entity_triples.append(triples)
+
+    return entity_triples, bad_lines
+
+
+def read_line_chunks(f) -> Iterator[list]:
+    """
+    Read the dump stream in blocks of `READ_BUFFER_SIZE` bytes and yield the complete
+    lines of each block (without newlines). The partial last line of a block is
+    carried over to the next one.
+    """
+    tail = b""
+    while True:
+        block = f.read(READ_BUFFER_SIZE)
+        if not block:
+            break
+        lines = block.split(b"\n")
+        lines[0] = tail + lines[0]
+        tail = lines.pop()
+        if lines:
+            yield lines
+    if tail:
+        yield [tail]
+
+
+def iterate_in_thread(items: Iterator, maxsize: int) -> Iterator:
+    """
+    Iterate over `items` in a background thread that stays up to `maxsize` items
+    ahead. Decompression and file reads release the GIL, so reading the dump this way
+    overlaps extraction even within one process. Errors are raised in the consumer.
+    """
+    done = object()
+    pending = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                pending.put(item)
+            pending.put(done)
+        except BaseException as e:
+            pending.put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Stop the thread if iteration ended early, making room for an item it may
+        # be waiting to put
+        stop.set()
+        while thread.is_alive():
+            try:
+                pending.get_nowait()
+            except queue.Empty:
+                thread.join(0.01)
+
+
+def extract_chunks(f, num_workers: int) -> Iterator[tuple]:
+    """
+    Split the dump stream into chunks of lines with `read_line_chunks` and extract
+    them with `extract_chunk`, in `num_workers` processes if more than one. Results
+    keep the order of the dump.
+    """
+    if num_workers <= 1:
+        with closing(
+            iterate_in_thread(read_line_chunks(f), READ_AHEAD_CHUNKS)
+        ) as chunks:
+            yield from map(extract_chunk, chunks)
+        return
+
+    # Workers are started by a fork server where available: they are only started
+    # on the first submitted chunk, when the reader thread already runs, and forking
+    # a process with several threads can deadlock the child
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("forkserver")
+    else:
+        mp_context = None
+    with ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=mp_context
+    ) as executor:
+        with closing(
+            iterate_in_thread(read_line_chunks(f), READ_AHEAD_CHUNKS)
+        ) as chunks:
+            # Only a few chunks per worker are in flight, so reading never runs far
+            # ahead of extraction
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(extract_chunk, chunk))
+                if len(pending) >= 2 * num_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+@contextmanager
+def open_pigz_writer(path: str, level: int = 1, threads: int = 2):
+    """
+    Open a binary stream whose data is gzip-compressed into `path` by a `pigz`
+    process, which compresses with `threads` threads.
+    """
+    with open(path, "wb") as out_f:
+        proc = subprocess.Popen(
+            [PIGZ, f"-{level}", "-p", str(threads)],
+            stdin=subprocess.PIPE,
+            stdout=out_f,
+        )
+        try:
+            yield proc.stdin
+        finally:
+            proc.stdin.close()
+            proc.wait()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+
+@contextmanager
+def open_raw_writer(path: str):
+    """
+    Open `path` for writing without Python's I/O buffering. Yields a function that
+    writes all of the given bytes straight to the file descriptor with `os.write`.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+    def write(data: bytes) -> None:
+        # os.write may write less than it was given, so write until all is written
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+
+    try:
+        yield write
+    finally:
+        os.close(fd)
+
+
+def render_rows(entity_triples: list) -> bytes:
+    """
+    Render the triples of several entities as TSV rows in a single bytes object.
+    """
+    rows = [b"\tP31\t".join(triple) for triples in entity_triples for triple in triples]
+    if not rows:
+        return b""
+    return b"\n".join(rows) + b"\n"
+
+
+@contextmanager
+def open_tsv_batch(batch_file: str, compression: str = "none"):
+    """
+    Open a TSV batch file for writing and write its header. Yields the function that
+    writes rows to it. With 'gzip' compression, level 1 is used, through `pigz` if
+    available.
+    """
+    if compression == "none":
+        # Rows already come in large blocks, so they are written without buffering
+        with open_raw_writer(batch_file) as write:
+            write(TSV_HEADER)
+            yield write
+        return
+
+    if PIGZ is not None:
+        opened = open_pigz_writer(batch_file)
+    else:
+        opened = gzip.open(batch_file, "wb", compresslevel=1)
+    with opened as out_f:
+        out_f.write(TSV_HEADER)
+        yield out_f.write
+
+
+@contextmanager
+def open_parquet_batch(batch_file: str):
+    """
+    Collect the triples of a batch and write them to a Parquet file on exit, as
+    dictionary-encoded columns compressed with zstd. Yields the function that adds
+    the triples of several entities.
+    """
+    entity_ids = []
+    value_ids = []
+
+    def add_triples(entity_triples: list) -> None:
+        pairs = [pair for triples in entity_triples for pair in triples]
+        entity_ids.extend([entity_id for entity_id, _ in pairs])
+        value_ids.extend([value_id for _, value_id in pairs])
+
+    yield add_triples
+
+    table = pa.table(
+        {
+            "entity_id": pa.array(entity_ids, pa.string()).dictionary_encode(),
+            "property_id": pa.repeat("P31", len(entity_ids)).dictionary_encode(),
+            "value_id": pa.array(value_ids, pa.string()).dictionary_encode(),
+        }
+    )
+    pq.write_table(table, batch_file, compression="zstd", compression_level=3)
+
+
+@contextmanager
+def open_batch(batch_file: str, compression: str = "none", output_format: str = "tsv"):
+    """
+    Open a batch file of the given format for writing. Yields the function that
+    writes the triples of several entities to it.
+    """
+    if output_format == "parquet":
+        with open_parquet_batch(batch_file) as add_triples:
+            yield add_triples
+        return
+
+    with open_tsv_batch(batch_file, compression) as write:
+        yield lambda entity_triples: write(render_rows(entity_triples))
+
+
+@contextmanager
+def write_in_thread(write, maxsize: int = WRITE_BEHIND_CHUNKS):
+    """
+    Call `write` from a background thread, so that rendering, writing (and
+    compressing) a batch overlaps extraction. Yields a function that queues data for
+    it. All queued data is written on exit, and the first error of `write` is raised
+    then.
+    """
+    pending = queue.Queue(maxsize)
+    errors = []
+
+    def consume():
+        for data in iter(pending.get, None):
+            # After an error, data is still taken off the queue so that it never
+            # blocks the producer
+            if not errors:
+                try:
+                    write(data)
+                except BaseException as e:
+                    errors.append(e)
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    try:
+        yield pending.put
+    finally:
+        pending.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def get_batch_suffix(compression: str = "none", output_format: str = "tsv") -> str:
+    """
+    Get the file name suffix of batch files, e.g., ".tsv.gz".
+    """
+    if output_format == "parquet":
+        return ".parquet"
+    return ".tsv" + COMPRESSION_SUFFIXES[compression]
+
+
+def extract_batches(
     dump_file: str,
     p31_dir: str,
     num_entities_per_batch: int,
     dummy: bool,
-) -> None:
+    num_workers: int = 1,
+    compression: str = "none",
+    output_format: str = "tsv",
+) -> tuple:
     """
-    Process the Wikidata dump file and extract P31 triples, saving results
-    in the specified directory.
+    Extract P31 triples from one dump file into batch files in `p31_dir`. Returns the
+    number of batch files, the number of entities, and the number of lines with
+    decoding errors.
     """
-    start_time = time.time()
-
     # Create directory for P31
     os.makedirs(p31_dir, exist_ok=True)
+    # Batch paths are built from a template prepared once rather than joined per
+    # batch; braces in the directory name are escaped for str.format
+    make_batch_path = (
+        os.path.join(p31_dir.replace("{", "{{").replace("}", "}}"), "batch_{}")
+        + get_batch_suffix(compression, output_format)
+    ).format
 
-    entity_buffer = []
+    write_triples = None  # Writes to the batch file open between batch boundaries
+    num_batch_entities = 0
     batch_idx_p31 = 0
     total_entities = 0
     num_lines_error = 0
 
-    with gzip.open(dump_file, "rt", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line in ("[", "]"):  # Skip JSON array brackets
-                continue
-            try:
-                entity = json.loads(line.rstrip(","))
-                entity_buffer.append(entity)
-                total_entities += 1
-
-                # Process batch when buffer is full
-                if len(entity_buffer) >= num_entities_per_batch:
-                    print(f"Processing batch {batch_idx_p31} for P31...")
-
-                    # Process P31
-                    triples_p31 = []
-                    for entity in entity_buffer:
-                        triples_p31.extend(extract_property_triples(entity, "P31"))
-                    batch_file_p31 = os.path.join(p31_dir, f"batch_{batch_idx_p31}.tsv")
-                    with open(batch_file_p31, "w", encoding="utf-8") as out_f:
-                        out_f.write("entity_id\tproperty_id\tvalue_id\n")
-                        for triple in triples_p31:
-                            out_f.write(f"{triple[0]}\t{triple[1]}\t{triple[2]}\n")
-                    batch_idx_p31 += 1
-
-                    entity_buffer = []
-
-                    # Stop early in dummy mode
-                    if dummy and batch_idx_p31 >= 1:
-                        break
-
-            except json.JSONDecodeError:
-                print("Error decoding JSON line:", line)
-                num_lines_error += 1
-                continue
+    with open_dump(dump_file) as f, closing(extract_chunks(f, num_workers)) as chunks:
+        with ExitStack() as batch:
+            for entity_triples, bad_lines in chunks:
+                for line in bad_lines:
+                    print("Error decoding JSON line:", line.decode("utf-8", "replace"))
+                num_lines_error += len(bad_lines)
+
+                # Triples are written to the open batch file as each chunk arrives,
+                # split where a batch is full
+                start = 0
+                while start < len(entity_triples):
+                    if write_triples is None:
+                        write_batch = batch.enter_context(
+                            open_batch(
+                                make_batch_path(batch_idx_p31),
+                                compression,
+                                output_format,
+                            )
+                        )
+                        write_triples = batch.enter_context(
+                            write_in_thread(write_batch)
+                        )
+
+                    stop = min(
+                        start + num_entities_per_batch - num_batch_entities,
+                        len(entity_triples),
+                    )
+                    write_triples(entity_triples[start:stop])
+                    num_batch_entities += stop - start
+                    total_entities += stop - start
+                    start = stop
+
+                    # Close the batch file when the batch is full
+                    if num_batch_entities >= num_entities_per_batch:
+                        if batch_idx_p31 % PRINT_EVERY_BATCHES == 0:
+                            print(f"Processing batch {batch_idx_p31} for P31...")
+                        batch.close()
+                        write_triples = None
+                        batch_idx_p31 += 1
+                        num_batch_entities = 0
+
+                        # Stop early in dummy mode
+                        if dummy and batch_idx_p31 >= 1:
+                            break
 
-        # Process remaining entities in the buffer
-        if entity_buffer:
-            print(f"Processing final batch {batch_idx_p31} for P31...")
+                if dummy and batch_idx_p31 >= 1:
+                    break
 
-            triples_p31 = []
-            for entity in entity_buffer:
-                triples_p31.extend(extract_property_triples(entity, "P31"))
-            batch_file_p31 = os.path.join(p31_dir, f"batch_{batch_idx_p31}.tsv")
-            with open(batch_file_p31, "w", encoding="utf-8") as out_f:
-                out_f.write("entity_id\tproperty_id\tvalue_id\n")
-                for triple in triples_p31:
-                    out_f.write(f"{triple[0]}\t{triple[1]}\t{triple[2]}\n")
+            # Close the last, partially filled batch file
+            if write_triples is not None:
+                print(f"Processing final batch {batch_idx_p31} for P31...")
+                batch.close()
+                batch_idx_p31 += 1
+
+    return batch_idx_p31, total_entities, num_lines_error
+
+
+def extract_shards(
+    dump_files: list,
+    p31_dir: str,
+    num_entities_per_batch: int,
+    jobs: int,
+    num_workers: int = 1,
+    compression: str = "none",
+    output_format: str = "tsv",
+) -> tuple:
+    """
+    Extract P31 triples from dump shards (consecutive parts of the dump) in `jobs`
+    processes, each shard into its own `shard_<k>` directory under `p31_dir`. The
+    batch files are then moved into `p31_dir` and renumbered in dump order, so every
+    shard ends with its own partially filled batch. Returns the same counts as
+    `extract_batches`.
+    """
+    shard_dirs = [os.path.join(p31_dir, f"shard_{k}") for k in range(len(dump_files))]
+    # The worker processes of --num_workers are shared among the jobs
+    workers_per_job = max(1, num_workers // jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                extract_batches,
+                dump_file,
+                shard_dir,
+                num_entities_per_batch,
+                False,
+                workers_per_job,
+                compression,
+                output_format,
+            )
+            for dump_file, shard_dir in zip(dump_files, shard_dirs)
+        ]
+        results = [future.result() for future in futures]
+
+    batch_suffix = get_batch_suffix(compression, output_format)
+    batch_idx_p31 = 0
+    for shard_dir, (num_batches, _, _) in zip(shard_dirs, results):
+        for shard_batch_idx in range(num_batches):
+            os.replace(
+                os.path.join(shard_dir, f"batch_{shard_batch_idx}{batch_suffix}"),
+                os.path.join(p31_dir, f"batch_{batch_idx_p31}{batch_suffix}"),
+            )
+            batch_idx_p31 += 1
+        os.rmdir(shard_dir)
+
+    total_entities = sum(num_entities for _, num_entities, _ in results)
+    num_lines_error = sum(num_errors for _, _, num_errors in results)
+    return batch_idx_p31, total_entities, num_lines_error
+
+
+def process_file(
+    dump_files: list,
+    p31_dir: str,
+    num_entities_per_batch: int,
+    dummy: bool,
+    num_workers: int = 1,
+    compression: str = "none",
+    output_format: str = "tsv",
+    jobs: int = 1,
+) -> None:
+    """
+    Process the Wikidata dump file, or its shards, and extract P31 triples, saving
+    results in the specified directory. Shards are processed in `jobs` processes; in
+    dummy mode, only one batch of the first one is.
+    """
+    start_time = time.time()
+
+    if len(dump_files) == 1 or dummy:
+        num_batches, total_entities, num_lines_error = extract_batches(
+            dump_files[0],
+            p31_dir,
+            num_entities_per_batch,
+            dummy,
+            num_workers,
+            compression,
+            output_format,
+        )
+    else:
+        num_batches, total_entities, num_lines_error = extract_shards(
+            dump_files,
+            p31_dir,
+            num_entities_per_batch,
+            jobs,
+            num_workers,
+            compression,
+            output_format,
+        )
 
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -139,11 +726,13 @@ def process_file(
     with open(log_file, "w") as log:
         log.write(f"Processing completed in {format_time(elapsed_time)}\n")
         log.write(f"Total entities processed: {total_entities}\n")
+        log.write(f"Batch files written: {num_batches}\n")
         log.write(f"P31 output directory: {p31_dir}\n")
         log.write(f"Lines with JSON decoding errors: {num_lines_error}\n")
 
     print(f"Processing completed in {format_time(elapsed_time)}")
     print(f"Total entities processed: {total_entities}")
+    print(f"Batch files written: {num_batches}")
     print(f"P31 output directory: {p31_dir}")
     print(f"Lines with JSON decoding errors: {num_lines_error}")
 
@@ -155,8 +744,10 @@ if __name__ == "__main__":
     parser.add_argument(
         "--dump_file",
         type=str,
-        default="latest-all.json.gz",
-        help="Path to the compressed Wikidata JSON dump file (default: latest-all.json.gz).",
+        nargs="+",
+        default=["latest-all.json.gz"],
+        help="Path to the compressed Wikidata JSON dump file, or to its compressed "
+        "shards in dump order (default: latest-all.json.gz).",
     )
     parser.add_argument(
         "--p31_dir",
@@ -175,11 +766,59 @@ if __name__ == "__main__":
         action="store_true",
         help="If set, process only one batch.",
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Processes that extract triples from chunks of lines (default: number "
+        "of CPUs).",
+    )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        default="none",
+        choices=list(COMPRESSION_SUFFIXES),
+        help="Write batch files as batch_<i>.tsv.gz, compressed with pigz if it is "
+        "on the PATH; process_p31_p279.py reads plain .tsv files (default: none).",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Write batch files as TSV, or as batch_<i>.parquet with zstd-compressed, "
+        "dictionary-encoded columns, which requires pyarrow; process_p31_p279.py "
+        "reads TSV files (default: tsv).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Dump shards processed in parallel, when --dump_file lists several "
+        "(default: 1).",
+    )
     args = parser.parse_args()
 
-    # Ensure the dump file exists
-    if not os.path.exists(args.dump_file):
-        print(f"Error: Dump file '{args.dump_file}' does not exist.")
+    # Ensure the dump files exist
+    for dump_file in args.dump_file:
+        if not os.path.exists(dump_file):
+            print(f"Error: Dump file '{dump_file}' does not exist.")
+            exit(1)
+
+    # A batch must hold at least one entity, or splitting chunks into batches never
+    # makes progress
+    if args.num_entities_per_batch < 1:
+        print("Error: --num_entities_per_batch must be at least 1.")
+        exit(1)
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1.")
+        exit(1)
+
+    if args.format == "parquet" and pq is None:
+        print("Error: --format parquet requires the pyarrow package.")
+        exit(1)
+    if args.format == "parquet" and args.compression != "none":
+        print("Error: --compression only applies to TSV batch files.")
         exit(1)
 
     process_file(
@@ -187,4 +826,8 @@ if __name__ == "__main__":
         args.p31_dir,
         args.num_entities_per_batch,
         dummy=args.dummy,
+        num_workers=args.num_workers,
+        compression=args.compression,
+        output_format=args.format,
+        jobs=args.jobs,
     )